@@ -1,24 +1,98 @@
 # oce/logging/logger.py
 from __future__ import annotations
-from datetime import datetime
+import atexit
+import queue
+import sys
+import threading
+import time
+
+# Sekuntitarkkuus riittää (timespec="seconds" ennenkin) → formatoi kerran
+# sekunnissa, ei kerran per lokirivi.
+_last_sec = 0
+_last_str = ""
 
 def _ts() -> str:
-    return datetime.utcnow().isoformat(timespec="seconds")
+    global _last_sec, _last_str
+    sec = int(time.time())
+    if sec != _last_sec:
+        _last_str = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+        _last_sec = sec
+    return _last_str
+
+# orjson jos saatavilla (Rust-toteutus, 3-10× nopeampi), muuten stdlib json
+try:
+    import orjson as _orjson
+
+    def _dumps(payload) -> str:
+        return _orjson.dumps(payload).decode()
+except Exception:
+    import json as _json
+
+    def _dumps(payload) -> str:
+        return _json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
 
 def _fmt(payload) -> str:
     try:
-        import json
-        return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        return _dumps(payload)
     except Exception:
         return str(payload)
 
+# Synkroninen print() ottaa stdio-lukon ja tekee syscallin per rivi.
+# Jono + yksi taustasäie kirjoittaa erissä → kutsujasäikeet eivät blokkaa.
+_Q: queue.SimpleQueue = queue.SimpleQueue()
+
+def _write_batch(batch: list[bytes]) -> None:
+    data = b"".join(batch)
+    try:
+        out = sys.stdout.buffer
+    except AttributeError:
+        sys.stdout.write(data.decode("utf-8", "replace"))
+        sys.stdout.flush()
+        return
+    out.write(data)
+    sys.stdout.flush()
+
+def _drain_loop() -> None:  # pragma: no cover - taustasäie
+    while True:
+        batch = [_Q.get()]
+        try:
+            while len(batch) < 256:
+                batch.append(_Q.get_nowait())
+        except queue.Empty:
+            pass
+        try:
+            _write_batch(batch)
+        except Exception:
+            pass
+
+_WRITER = threading.Thread(target=_drain_loop, name="oce-log-writer", daemon=True)
+_WRITER.start()
+
+def _flush_at_exit() -> None:
+    batch: list[bytes] = []
+    try:
+        while True:
+            batch.append(_Q.get_nowait())
+    except queue.Empty:
+        pass
+    if batch:
+        try:
+            _write_batch(batch)
+        except Exception:
+            pass
+
+atexit.register(_flush_at_exit)
+
+def _emit(line: str) -> None:
+    _Q.put((line + "\n").encode("utf-8"))
+
 def log_event(event: str, payload: dict | None = None) -> None:
     p = _fmt(payload or {})
-    print(f"[{_ts()}] {event} {p}")
+    _emit(f"[{_ts()}] {event} {p}")
 
 def log_exception(event: str, payload: dict | None = None) -> None:
     p = _fmt(payload or {})
-    print(f"[{_ts()}] EXCEPTION {event} {p}")
+    _emit(f"[{_ts()}] EXCEPTION {event} {p}")
 
 def log_heuristic(rr) -> None:
     # rr is router.RouteResult
@@ -26,4 +100,4 @@ def log_heuristic(rr) -> None:
     conf = rr.confidence
     modules = ",".join(rr.selected_modules) if rr.selected_modules else "-"
     hits = rr.keyword_hits.get(rr.intent, [])
-    print(f"[{_ts()}] OCE_ROUTER intent={intent} conf={conf} modules={modules} self={rr.self_check} hits={hits}")
+    _emit(f"[{_ts()}] OCE_ROUTER intent={intent} conf={conf} modules={modules} self={rr.self_check} hits={hits}")
@@ -1,38 +1,207 @@
 from __future__ import annotations
-import json, os
-from dataclasses import dataclass, asdict
+import atexit, json, mmap, os, pickle, tempfile, threading, time
+from dataclasses import dataclass
 from typing import List, Dict, Any
 
+# orjson jos saatavilla — nopeampi sekä dumps- että loads-suunnassa
+try:
+    import orjson as _orjson
+
+    def _dumps(payload: dict) -> str:
+        return _orjson.dumps(payload).decode()
+
+    _loads = _orjson.loads
+    _JSONError = (ValueError,)
+except Exception:
+    def _dumps(payload: dict) -> str:
+        return json.dumps(payload, ensure_ascii=False)
+
+    _loads = json.loads
+    _JSONError = (json.JSONDecodeError,)
+
+# io_uring-eräkirjoittaja (vain Linux + liburing; muuten None)
+try:
+    from . import _uring_writer
+except Exception:
+    _uring_writer = None
+
 STORE_PATH = os.path.join(os.path.dirname(__file__), "memory_store.jsonl")
+# Sivutiedosto: {project_id: [tavuoffsetit storeen]} → luku on O(osumat), ei O(tiedosto)
+IDX_PATH = STORE_PATH + ".idx"
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class Summary:
     project_id: str
     topics: List[str]
     decisions: List[str]
     next_steps: List[str]
 
-def _append(line: dict) -> None:
+def _load_index() -> tuple[int, Dict[str, List[int]]]:
+    # Palauttaa (katettu tavumäärä, {project_id: [offsetit]}). Katettu
+    # laajuus kertoo mihin asti storea indeksi vastaa — sen jälkeiset
+    # tavut (vanha store, kesken jäänyt erä) skannataan erikseen.
+    if not os.path.exists(IDX_PATH):
+        return 0, {}
+    try:
+        with open(IDX_PATH, "rb") as f:
+            idx = pickle.load(f)
+    except Exception:
+        return 0, {}
+    if isinstance(idx, dict) and isinstance(idx.get("covered"), int) and isinstance(idx.get("offsets"), dict):
+        return idx["covered"], idx["offsets"]
+    if isinstance(idx, dict):
+        # Vanha sivutiedostomuoto ilman katettua laajuutta — 0 pakottaa
+        # koko tiedoston skannauksen/korjauksen kertaalleen.
+        return 0, idx
+    return 0, {}
+
+def _save_index(covered: int, offsets: Dict[str, List[int]]) -> None:
+    # Atominen korvaus, ettei rikkinäinen indeksi jää levylle
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(IDX_PATH), suffix=".idx.tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"covered": covered, "offsets": offsets}, f)
+        os.replace(tmp, IDX_PATH)
+    except Exception:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+def _index_range(idx: Dict[str, List[int]], start: int, end: int) -> None:
+    # Indeksoi storen kattamaton väli [start, end) — esim. ennen indeksiä
+    # kirjoitetut rivit tai aiemman kaatumisen jälkeen indeksoimatta
+    # jäänyt häntä. Rikkinäiset rivit ohitetaan.
+    with open(STORE_PATH, "rb") as f:
+        f.seek(start)
+        pos = start
+        for raw in f:
+            if pos >= end:
+                break
+            try:
+                rec = _loads(raw)
+            except _JSONError:
+                rec = None
+            pid = rec.get("project_id") if isinstance(rec, dict) else None
+            if isinstance(pid, str):
+                idx.setdefault(pid, []).append(pos)
+            pos += len(raw)
+
+# Kirjoituspuskuri: open+write+close per rivi on patologinen syscall-kuvio.
+# Keräämme rivit ja flushataan erissä — indeksi päivittyy kerran per erä.
+_BUF: List[dict] = []
+_LOCK = threading.Lock()
+_FLUSH_MAX_RECORDS = 64
+_FLUSH_MAX_AGE = 0.25  # sekuntia
+_last_flush = time.monotonic()
+
+def _flush_locked() -> None:
+    global _last_flush
+    _last_flush = time.monotonic()
+    if not _BUF:
+        return
+    batch, _BUF[:] = _BUF[:], []
     os.makedirs(os.path.dirname(STORE_PATH), exist_ok=True)
-    with open(STORE_PATH, "a", encoding="utf-8") as f:
-        f.write(json.dumps(line, ensure_ascii=False) + "\n")
+    payloads = [_dumps(line).encode("utf-8") + b"\n" for line in batch]
+    offsets: List[int] | None = None
+    if _uring_writer is not None and _uring_writer.available():
+        pre_size = os.path.getsize(STORE_PATH) if os.path.exists(STORE_PATH) else 0
+        try:
+            offsets = _uring_writer.write_batch(STORE_PATH, payloads)
+        except Exception:
+            offsets = None
+            post_size = os.path.getsize(STORE_PATH) if os.path.exists(STORE_PATH) else 0
+            if post_size != pre_size:
+                # Erä ehti osin levylle — puskuroitu uudelleenkirjoitus
+                # duplikoisi tietueet. Suljetaan mahdollinen vajaa rivi
+                # rivinvaihdolla ja jätetään erä indeksoimatta; ehjät rivit
+                # kattaa suffiksiskannaus ja seuraavan erän indeksikorjaus.
+                with open(STORE_PATH, "ab") as f:
+                    f.write(b"\n")
+                return
+    if offsets is None:
+        offsets = []
+        with open(STORE_PATH, "ab") as f:
+            for payload in payloads:
+                offsets.append(f.tell())
+                f.write(payload)
+    covered, idx = _load_index()
+    if covered > offsets[0]:
+        # Store on kutistunut indeksin alta (esim. poistettu välissä) —
+        # hylätään vanha indeksi ja rakennetaan alusta.
+        covered, idx = 0, {}
+    if covered < offsets[0]:
+        _index_range(idx, covered, offsets[0])
+    for line, offset in zip(batch, offsets):
+        pid = line.get("project_id")
+        if isinstance(pid, str):
+            idx.setdefault(pid, []).append(offset)
+    _save_index(offsets[-1] + len(payloads[-1]), idx)
+
+def flush() -> None:
+    with _LOCK:
+        _flush_locked()
+
+atexit.register(flush)
+
+def _append(line: dict) -> None:
+    with _LOCK:
+        _BUF.append(line)
+        if len(_BUF) >= _FLUSH_MAX_RECORDS or time.monotonic() - _last_flush > _FLUSH_MAX_AGE:
+            _flush_locked()
+
+def _scan_all(project_id: str, topics: set, decisions: set, next_steps: set, start: int = 0) -> None:
+    # Lineaarinen skannaus offsetista eteenpäin: koko tiedosto kun indeksiä
+    # ei ole, tai vain indeksin kattaman laajuuden jälkeinen häntä.
+    with open(STORE_PATH, "rb") as f:
+        f.seek(start)
+        for line in f:
+            try:
+                rec = _loads(line)
+            except _JSONError:
+                continue
+            if rec.get("project_id") == project_id:
+                topics.update(rec.get("topics", []))
+                decisions.update(rec.get("decisions", []))
+                next_steps.update(rec.get("next_steps", []))
 
 def load_summary(project_id: str) -> Dict[str, Any]:
+    flush()  # read-your-writes: puskuroidut rivit levylle ennen lukua
     if not os.path.exists(STORE_PATH):
         return {"topics": [], "decisions": [], "next_steps": []}
     topics, decisions, next_steps = set(), set(), set()
-    with open(STORE_PATH, "r", encoding="utf-8") as f:
-        for line in f:
-            try:
-                rec = json.loads(line)
-                if rec.get("project_id") == project_id:
-                    topics.update(rec.get("topics", []))
-                    decisions.update(rec.get("decisions", []))
-                    next_steps.update(rec.get("next_steps", []))
-            except json.JSONDecodeError:
-                continue
+    covered, idx = _load_index()
+    size = os.path.getsize(STORE_PATH)
+    if idx and covered <= size:
+        # Indeksoitu polku: mmap + parsitaan vain osuvat rivit. Indeksin
+        # kattaman laajuuden jälkeinen häntä (esim. kaatuminen ennen
+        # _save_indexiä) skannataan lineaarisesti perään.
+        try:
+            with open(STORE_PATH, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for off in idx.get(project_id, []):
+                        end = mm.find(b"\n", off)
+                        raw = mm[off:end if end >= 0 else len(mm)]
+                        try:
+                            rec = _loads(raw)
+                        except _JSONError:
+                            continue
+                        topics.update(rec.get("topics", []))
+                        decisions.update(rec.get("decisions", []))
+                        next_steps.update(rec.get("next_steps", []))
+            if covered < size:
+                _scan_all(project_id, topics, decisions, next_steps, start=covered)
+        except (OSError, ValueError):
+            _scan_all(project_id, topics, decisions, next_steps)
+    else:
+        _scan_all(project_id, topics, decisions, next_steps)
     return {"topics": sorted(topics), "decisions": sorted(decisions), "next_steps": sorted(next_steps)}
 
 def update(project_id: str, topics: List[str], decisions: List[str], next_steps: List[str]) -> None:
-    payload = Summary(project_id=project_id, topics=sorted(set(topics)), decisions=sorted(set(decisions)), next_steps=sorted(set(next_steps)))
-    _append(asdict(payload))
+    # Rakennetaan serialisoitava dict suoraan — asdict tekisi rekursiivisen kopion
+    _append({
+        "project_id": project_id,
+        "topics": sorted(set(topics)),
+        "decisions": sorted(set(decisions)),
+        "next_steps": sorted(set(next_steps)),
+    })
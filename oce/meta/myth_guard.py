@@ -2,10 +2,33 @@ from __future__ import annotations
 import re
 from typing import Dict, Any, List
 
-_STRONG_PATTERNS = [
+# Käännetään kerran moduulin latauksessa — ei re-cachen hashausta per kutsu.
+_STRONG_RAW = (
     r"\balways\b", r"\bnever\b", r"\bmust\b", r"\bguarantee(d)?\b",
     r"\bik(i|u)inä\b", r"\baina\b", r"\bei koskaan\b", r"\bpakko\b",
-]
+)
+# Yksi alternaatio-regex → yksi skannaus tekstin yli N:n sijaan.
+_COMBINED = re.compile(
+    "|".join(f"(?P<g{i}>{p})" for i, p in enumerate(_STRONG_RAW)),
+    re.IGNORECASE,
+)
+
+# Halpa literaali-esiskannaus: useimmissa teksteissä ei ole yhtään vahvaa
+# sanaa, jolloin regex-moottoria ei tarvitse käynnistää lainkaan.
+# Literaalit johdetaan kuvioista (pisin etuliite ennen ensimmäistä
+# metamerkkiä), jotta esiskannaus pysyy regexin ylijoukkona eikä voi
+# ajautua siitä eroon.
+def _literal_prefix(pat: str) -> str:
+    if pat.startswith(r"\b"):
+        pat = pat[2:]
+    out = []
+    for ch in pat:
+        if ch in r"\[](){}?*+|^$.":
+            break
+        out.append(ch)
+    return "".join(out)
+
+_LITERALS = tuple(_literal_prefix(p) for p in _STRONG_RAW)
 
 class MythGuard:
     """
@@ -15,9 +38,14 @@ class MythGuard:
     name = "MythGuard"
 
     def analyze(self, assembled_text: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        tl = assembled_text.lower()
+        if not any(w in tl for w in _LITERALS):
+            return {"status": "clean", "findings": [], "recommendation": "No strong claims detected."}
+
         findings: List[str] = []
-        for pat in _STRONG_PATTERNS:
-            if re.search(pat, assembled_text, flags=re.IGNORECASE):
+        for m in _COMBINED.finditer(assembled_text):
+            pat = _STRONG_RAW[int(m.lastgroup[1:])]
+            if pat not in findings:
                 findings.append(pat)
 
         if not findings:
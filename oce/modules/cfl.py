@@ -20,30 +20,30 @@ Heuristiikka:
 - Status: {untested | partially supported | contradicted}, jos session_ctx antaa vihjeen.
 """
 
-# yksinkertaisia claim-signaaleja
-CLAIM_PATS = [
+# yksinkertaisia claim-signaaleja — käännetty kerran moduulin latauksessa
+CLAIM_PATS = tuple(re.compile(p, re.IGNORECASE) for p in (
     r"\b(if .+ then .+)\b",
     r"\b([A-Za-z][\w\s\-]+)\s+causes\s+([A-Za-z][\w\s\-]+)\b",
     r"\b([A-Za-z][\w\s\-]+)\s+increases\s+([A-Za-z][\w\s\-]+)\b",
     r"\b([A-Za-z][\w\s\-]+)\s+reduces\s+([A-Za-z][\w\s\-]+)\b",
-]
+))
 
 def _extract_claim(text: str) -> str | None:
     t = text.strip()
     # If-then ensin
-    m = re.search(CLAIM_PATS[0], t, re.IGNORECASE)
+    m = CLAIM_PATS[0].search(t)
     if m:
         return m.group(1).strip().rstrip(".")
     # verbilauseet
     for pat in CLAIM_PATS[1:]:
-        m = re.search(pat, t, re.IGNORECASE)
+        m = pat.search(t)
         if m:
             subj = m.group(1).strip()
             obj = m.group(2).strip()
             verb = "→"
-            if "increases" in pat:
+            if "increases" in pat.pattern:
                 verb = "↑→"
-            elif "reduces" in pat:
+            elif "reduces" in pat.pattern:
                 verb = "↓→"
             return f"{subj} {verb} {obj}"
     return None
@@ -1,9 +1,73 @@
 # oce/modules/risk_expected_loss.py
 from __future__ import annotations
 from typing import Dict, Any, List, Tuple
+import functools
+import io
 import re
-import random
-import statistics as stats
+
+# --- Optional NumPy (graceful fallback) ---
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+# --- Optional Numba (graceful fallback) ---
+# Iso trials-määrä NumPy-polulla varaa trials×n_risks-matriisin; JIT-kerneli
+# pitää akkumulaattorin rekisterissä ja skaalautuu ytimille O(trials)-muistilla.
+_mc_kernel = None
+if np is not None:
+    try:
+        from numba import njit, prange
+
+        @njit(parallel=True, fastmath=True, cache=True)
+        def _mc_kernel(p, L, trials, seed):  # pragma: no cover - JIT-käännetty
+            np.random.seed(seed)
+            out = np.empty(trials, dtype=np.float64)
+            for t in prange(trials):
+                tot = 0.0
+                for i in range(p.size):
+                    # Haaraton muoto: vertailu→maski→FMA; ei dataherkkää
+                    # hyppyä, jolloin sisäsilmukka SIMD-vektoroituu.
+                    tot += (np.random.random() < p[i]) * L[i]
+                out[t] = tot
+            return out
+    except Exception:
+        _mc_kernel = None
+
+# Raja, jonka yli NumPy-matriisin muistijälki alkaa haitata → käytä kerneliä.
+_NUMBA_TRIALS_THRESHOLD = 100_000
+
+# Ilman Numbaa hyvin isot ajot jaetaan prosesseille; raja korkealla, koska
+# pool-käynnistys maksaa eikä kannata pienillä trials-määrillä.
+_PROCESS_TRIALS_THRESHOLD = 500_000
+
+def _mc_chunk(p_t: Tuple[float, ...], L_t: Tuple[float, ...], n_chunk: int, seed: int):
+    # Moduulitason funktio pickle-syistä; ajetaan työprosessissa.
+    import numpy as _n
+    rng = _n.random.default_rng(seed)
+    p = _n.asarray(p_t, dtype=_n.float64)
+    L = _n.asarray(L_t, dtype=_n.float64)
+    losses = _n.empty(n_chunk, dtype=_n.float64)
+    block = 4096
+    for s in range(0, n_chunk, block):
+        m = min(block, n_chunk - s)
+        losses[s:s + m] = (rng.random((m, p.size)) < p) @ L
+    return losses
+
+def _simulate_losses_procs(p, L, trials: int, seed: int):
+    # Riippumattomat MC-lohkot rinnakkain; siemenet SeedSequence.spawnilla,
+    # jotta lohkojen virrat eivät korreloi.
+    import os
+    from concurrent.futures import ProcessPoolExecutor
+    workers = min(os.cpu_count() or 1, 8)
+    chunk = trials // workers
+    sizes = [chunk] * workers
+    sizes[-1] += trials - chunk * workers
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    p_t, L_t = tuple(map(float, p)), tuple(map(float, L))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(_mc_chunk, [p_t] * workers, [L_t] * workers, sizes, seeds))
+    return np.concatenate(parts)
 
 """
 RiskExpectedLoss
@@ -15,47 +79,41 @@ RiskExpectedLoss
 - Raportoi VaR95 ja ES95 (Expected Shortfall) tappiojakaumasta.
 """
 
-RISK_PAT = re.compile(
+# Riskit (p=, L=) ja mitigoinnit (dp, dL, cost) yhdessä alternaatiossa —
+# yksi skannaus user_textin yli kahden sijaan; dispatch nimetyn ryhmän mukaan.
+RISK_MITI_PAT = re.compile(
     r"""
-    (?P<name>[A-Za-z][\w\s\-]+?)\s*:\s*
+    (?P<rname>[A-Za-z][\w\s\-]+?)\s*:\s*
     p\s*=\s*(?P<p>\d+(?:\.\d+)?)\s*,\s*
     L\s*=\s*(?P<L>\d+(?:\.\d+)?)
-    """, re.VERBOSE | re.IGNORECASE
-)
-
-MITI_PAT = re.compile(
-    r"""
-    (?P<name>[A-Za-z][\w\s\-]+?)\s*:\s*
+    |
+    (?P<mname>[A-Za-z][\w\s\-]+?)\s*:\s*
     (?:dp\s*=\s*(?P<dp>\d+(?:\.\d+)?))?\s*,?\s*
     (?:dL\s*=\s*(?P<dL>\d+(?:\.\d+)?))?\s*,?\s*
     cost\s*=\s*(?P<cost>\d+(?:\.\d+)?)
     """, re.VERBOSE | re.IGNORECASE
 )
 
-def _parse_risks(user_text: str) -> List[Dict[str, Any]]:
+def _parse_inputs(user_text: str) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, float]]]:
     risks: List[Dict[str, Any]] = []
-    for m in RISK_PAT.finditer(user_text):
-        name = m.group("name").strip()
-        p = float(m.group("p"))
-        L = float(m.group("L"))
-        p = max(0.0, min(1.0, p))
-        L = max(0.0, L)
-        risks.append({"name": name, "p": p, "L": L})
-    return risks
-
-def _parse_mitigations(user_text: str) -> Dict[str, Dict[str, float]]:
-    outs: Dict[str, Dict[str, float]] = {}
-    for m in MITI_PAT.finditer(user_text):
-        name = m.group("name").strip()
-        dp = m.group("dp")
-        dL = m.group("dL")
-        cost = m.group("cost")
-        outs[name.lower()] = {
-            "dp": float(dp) if dp else 0.0,
-            "dL": float(dL) if dL else 0.0,
-            "cost": float(cost) if cost else 0.0
-        }
-    return outs
+    mitigations: Dict[str, Dict[str, float]] = {}
+    for m in RISK_MITI_PAT.finditer(user_text):
+        if m.group("rname") is not None:
+            name = m.group("rname").strip()
+            p = max(0.0, min(1.0, float(m.group("p"))))
+            L = max(0.0, float(m.group("L")))
+            risks.append({"name": name, "p": p, "L": L})
+        else:
+            name = m.group("mname").strip()
+            dp = m.group("dp")
+            dL = m.group("dL")
+            cost = m.group("cost")
+            mitigations[name.lower()] = {
+                "dp": float(dp) if dp else 0.0,
+                "dL": float(dL) if dL else 0.0,
+                "cost": float(cost) if cost else 0.0
+            }
+    return risks, mitigations
 
 def _default_risks() -> List[Dict[str, Any]]:
     return [
@@ -79,20 +137,51 @@ def _apply_mitigation(r: Dict[str, Any], miti: Dict[str, float]) -> Tuple[float,
 def _expected_loss(risks: List[Dict[str, Any]]) -> float:
     return sum(r["p"] * r["L"] for r in risks)
 
+# Koodigeneroidut kernelit kiinteälle riskivektorille: p/L upotetaan
+# literaaleina, jolloin sisäsilmukasta katoavat indeksoinnit ja rajatarkistukset.
+# Sama riskijoukko simuloidaan usein monta kertaa (herkkyysanalyysi).
+_KERNEL_CACHE: Dict[Tuple[Tuple[float, float], ...], Any] = {}
+
+def _make_kernel(p: List[float], L: List[float]):
+    key = tuple(zip(p, L))
+    kernel = _KERNEL_CACHE.get(key)
+    if kernel is None:
+        body = (
+            "def k(trials, rnd):\n"
+            " losses = [0.0] * trials\n"
+            " for t in range(trials):\n"
+            "  tot = 0.0\n"
+            + "".join(f"  if rnd() < {pi!r}: tot += {Li!r}\n" for pi, Li in key)
+            + "  losses[t] = tot\n"
+            " return losses\n"
+        )
+        ns: Dict[str, Any] = {}
+        exec(body, ns)
+        kernel = ns["k"]
+        if len(_KERNEL_CACHE) >= 32:
+            _KERNEL_CACHE.clear()
+        _KERNEL_CACHE[key] = kernel
+    return kernel
+
 def _simulate_losses(risks: List[Dict[str, Any]], trials: int = 20000, seed: int = 42) -> Tuple[float, float]:
     """
     Palauttaa (VaR95, ES95) riippumattomuusoletuksella.
     VaR95 = 95% kvantiili tappioista.
     ES95 = odotusarvo tappioista, jotka ylittävät VaR95:n.
+
+    Huom: `risks` sisältää jo efektiiviset (p, L) — run() soveltaa mitigoinnit
+    kerran ennen kutsua, joten trials-silmukassa ei tehdä mitigointilaskentaa.
     """
-    random.seed(seed)
-    losses: List[float] = []
-    for _ in range(trials):
-        total = 0.0
-        for r in risks:
-            if random.random() < r["p"]:
-                total += r["L"]
-        losses.append(total)
+    if np is not None and risks:
+        return _simulate_losses_np(risks, trials, seed)
+    # Pure-Python fallback (NumPy ei asennettu): erikoistettu kerneli.
+    # random tuodaan vasta täällä — moni kutsuja ei aja MC:tä lainkaan.
+    import random
+    # Paikallinen Random-instanssi: ei jaetun globaalin tilan lukitusta,
+    # ja siemen pysyy simulaation omana (sama MT-sekvenssi kuin ennen).
+    rnd = random.Random(seed).random
+    kernel = _make_kernel([r["p"] for r in risks], [r["L"] for r in risks])
+    losses = kernel(trials, rnd)
     losses.sort()
     idx = int(0.95 * len(losses)) - 1
     idx = max(0, min(idx, len(losses)-1))
@@ -101,12 +190,169 @@ def _simulate_losses(risks: List[Dict[str, Any]], trials: int = 20000, seed: int
     es95 = sum(tail)/len(tail) if tail else var95
     return var95, es95
 
+def _tail_stats_np(losses) -> Tuple[float, float]:
+    # Yhden kvantiilin lukemiseen riittää osittainen järjestys (ks. alla).
+    trials = losses.size
+    idx = int(0.95 * trials) - 1
+    idx = max(0, min(idx, trials - 1))
+    part = np.partition(losses, idx)
+    var95 = float(part[idx])
+    tail = part[idx:]
+    es95 = float(tail.mean()) if tail.size else var95
+    return var95, es95
+
+def _simulate_losses_pair(risks_before: List[Dict[str, Any]], risks_after: List[Dict[str, Any]],
+                          trials: int = 20000, seed: int = 42) -> Tuple[float, float, float, float, float]:
+    """
+    Ennen/jälkeen-simulaatio yhteisillä satunnaisluvuilla (CRN): samat
+    uniformidraw'it syötetään molemmille (p, L) -vektoreille, jolloin
+    yhteinen kohina kumoutuu parierotuksessa ja Risk-reduction-estimaatin
+    varianssi romahtaa samalla trials-budjetilla. Palauttaa
+    (VaR95_before, ES95_before, VaR95_after, ES95_after, paired_mean_reduction).
+    """
+    if np is not None and risks_before:
+        n = len(risks_before)
+        p_b = np.fromiter((r["p"] for r in risks_before), np.float64, n)
+        L_b = np.fromiter((r["L"] for r in risks_before), np.float64, n)
+        p_a = np.fromiter((r["p"] for r in risks_after), np.float64, n)
+        L_a = np.fromiter((r["L"] for r in risks_after), np.float64, n)
+        rng = np.random.default_rng(seed)
+        half = max(1, trials // 2)
+        lb = np.empty(2 * half, dtype=np.float64)
+        la = np.empty(2 * half, dtype=np.float64)
+        block = 4096
+        for start in range(0, half, block):
+            m = min(block, half - start)
+            U = rng.random((m, n))
+            lb[start:start + m] = (U < p_b) @ L_b
+            la[start:start + m] = (U < p_a) @ L_a
+            V = 1.0 - U  # antiteettinen pari
+            lb[half + start:half + start + m] = (V < p_b) @ L_b
+            la[half + start:half + start + m] = (V < p_a) @ L_a
+        var_b, es_b = _tail_stats_np(lb)
+        var_a, es_a = _tail_stats_np(la)
+        return var_b, es_b, var_a, es_a, float((lb - la).mean())
+    # Fallback: sama siemen molemmille kerneleille → yhteiset draw'it, koska
+    # kerneli kuluttaa täsmälleen yhden rnd():n per riski per trial.
+    import random
+    kb = _make_kernel([r["p"] for r in risks_before], [r["L"] for r in risks_before])
+    ka = _make_kernel([r["p"] for r in risks_after], [r["L"] for r in risks_after])
+    lb = kb(trials, random.Random(seed).random)
+    la = ka(trials, random.Random(seed).random)
+    paired = sum(b - a for b, a in zip(lb, la)) / trials if trials else 0.0
+
+    def _tail(losses: List[float]) -> Tuple[float, float]:
+        losses = sorted(losses)
+        idx = int(0.95 * len(losses)) - 1
+        idx = max(0, min(idx, len(losses) - 1))
+        var95 = losses[idx]
+        tail = [x for x in losses if x >= var95]
+        es95 = sum(tail) / len(tail) if tail else var95
+        return var95, es95
+
+    var_b, es_b = _tail(lb)
+    var_a, es_a = _tail(la)
+    return var_b, es_b, var_a, es_a, paired
+
+def _simulate_losses_strat(risks: List[Dict[str, Any]], trials: int = 20000, seed: int = 42) -> Tuple[float, float]:
+    """
+    Ositettu otanta hännän tarkkuuteen: dominoiva riski (suurin p·L) jakaa
+    avaruuden kahteen ositteeseen ("laukeaa" / "ei laukea"), ja harvinainen
+    osite saa draw'eja yli luonnollisen osuutensa (~sqrt-allokaatio, koska
+    ehdolliset varianssit ovat ositteissa samat). VaR95/ES95 luetaan
+    painotetusta empiirisestä jakaumasta — sama trials-budjetti, selvästi
+    pienempi kvantiiliestimaatin varianssi. Vaatii NumPyn ja >= 2 riskiä.
+    """
+    n = len(risks)
+    p = np.fromiter((r["p"] for r in risks), np.float64, n)
+    L = np.fromiter((r["L"] for r in risks), np.float64, n)
+    d = int((p * L).argmax())
+    ps = float(p[d])
+    if n < 2 or ps <= 0.0 or ps >= 1.0:
+        return _simulate_losses(risks, trials, seed)
+    rest = np.ones(n, dtype=bool)
+    rest[d] = False
+    p_r, L_r = p[rest], L[rest]
+    # sqrt-allokaatio harvinaiselle ositteelle (Neyman samoilla sigma-arvoilla)
+    s1 = ps ** 0.5
+    n1 = max(1, min(trials - 1, round(trials * s1 / (s1 + (1.0 - ps) ** 0.5))))
+    n0 = trials - n1
+    rng = np.random.default_rng(seed)
+    losses1 = (rng.random((n1, n - 1)) < p_r) @ L_r + float(L[d])  # dominoiva laukeaa
+    losses0 = (rng.random((n0, n - 1)) < p_r) @ L_r               # ei laukea
+    losses = np.concatenate([losses1, losses0])
+    weights = np.concatenate([
+        np.full(n1, ps / n1), np.full(n0, (1.0 - ps) / n0)
+    ])
+    order = np.argsort(losses, kind="stable")
+    cw = np.cumsum(weights[order])
+    k = int(np.searchsorted(cw, 0.95))
+    k = min(k, losses.size - 1)
+    tail = order[k:]
+    var95 = float(losses[order[k]])
+    tw = weights[tail]
+    es95 = float((losses[tail] * tw).sum() / tw.sum()) if tw.sum() > 0 else var95
+    return var95, es95
+
+# Samat riskisyötteet toistuvat chat-käytössä kutsusta toiseen ja siemen on
+# deterministinen → identtinen simulaatio kannattaa muistaa. Avaimena
+# immutaabeli (p, L) -tuplemuoto; nimet eivät vaikuta jakaumaan.
+def _risk_key(risks: List[Dict[str, Any]]) -> Tuple[Tuple[float, float], ...]:
+    return tuple((float(r["p"]), float(r["L"])) for r in risks)
+
+@functools.lru_cache(maxsize=32)
+def _pair_cached(key_b, key_a, trials: int, seed: int):
+    rb = [{"p": p, "L": L} for p, L in key_b]
+    ra = [{"p": p, "L": L} for p, L in key_a]
+    return _simulate_losses_pair(rb, ra, trials, seed)
+
+@functools.lru_cache(maxsize=32)
+def _strat_cached(key, trials: int, seed: int):
+    return _simulate_losses_strat([{"p": p, "L": L} for p, L in key], trials, seed)
+
+def _simulate_losses_np(risks: List[Dict[str, Any]], trials: int, seed: int) -> Tuple[float, float]:
+    # Vektoroitu polku: Bernoulli-matriisi kerralla, summa BLAS-dotilla.
+    n = len(risks)
+    p = np.fromiter((r["p"] for r in risks), dtype=np.float64, count=n)
+    L = np.fromiter((r["L"] for r in risks), dtype=np.float64, count=n)
+    if _mc_kernel is not None and trials >= _NUMBA_TRIALS_THRESHOLD:
+        losses = _mc_kernel(p, L, trials, seed)
+    elif _mc_kernel is None and trials >= _PROCESS_TRIALS_THRESHOLD:
+        losses = _simulate_losses_procs(p, L, trials, seed)
+    else:
+        # Antiteettiset parit: jokaiselle u:lle myös 1-u. Parien negatiivinen
+        # korrelaatio pienentää estimaattorin varianssia ~2× samalla
+        # trials-budjetilla; VaR pysyy harhattomana tuplatun otoksen
+        # empiirisenä kvantiilina.
+        # Uniformimatriisi tuotetaan rivilohkoissa, jotta huippumuisti pysyy
+        # ~lohkon kokoisena (L2-ystävällinen) eikä kasva O(trials·n):ään.
+        rng = np.random.default_rng(seed)
+        half = max(1, trials // 2)
+        losses = np.empty(2 * half, dtype=np.float64)
+        block = 4096
+        for start in range(0, half, block):
+            m = min(block, half - start)
+            U = rng.random((m, n))
+            losses[start:start + m] = (U < p) @ L
+            losses[half + start:half + start + m] = ((1.0 - U) < p) @ L
+        trials = losses.size
+    # Yhden kvantiilin lukemiseen riittää osittainen järjestys: introselect on
+    # O(n) täyden O(n log n) -sortin sijaan, ja hännän keskiarvo ei välitä
+    # hännän sisäisestä järjestyksestä.
+    idx = int(0.95 * trials) - 1
+    idx = max(0, min(idx, trials - 1))
+    part = np.partition(losses, idx)
+    var95 = float(part[idx])
+    tail = part[idx:]
+    es95 = float(tail.mean()) if tail.size else var95
+    return var95, es95
+
 def run(user_text: str, context: Dict[str, Any]) -> Dict[str, Any]:
     session_ctx = (context or {}).get("session_ctx") or {}
     user_l = (user_text or "").lower()
 
-    # 1) Hae riskit
-    risks = _parse_risks(user_text)
+    # 1) Hae riskit ja mitigoinnit yhdellä parsinnalla
+    risks, mitigations = _parse_inputs(user_text)
     if not risks:
         ctx_risks = ((context or {}).get("risk") or {}).get("risks") if context else None
         if isinstance(ctx_risks, list) and ctx_risks:
@@ -114,73 +360,118 @@ def run(user_text: str, context: Dict[str, Any]) -> Dict[str, Any]:
         else:
             risks = _default_risks()
 
-    # 2) Hae mitigoinnit
-    mitigations = _parse_mitigations(user_text)
+    # 2) Mitigointien fallback
     if not mitigations:
         ctx_miti = ((context or {}).get("risk") or {}).get("mitigations") if context else None
         mitigations = ctx_miti if isinstance(ctx_miti, dict) else _default_mitigation()
 
-    # 3) EL ennen
-    EL_before = _expected_loss(risks)
-
-    # 4) EL jälkeen (sovella nimien mukaan; case-insensitive)
+    # 3+4) EL ennen/jälkeen (mitigoinnit nimien mukaan; case-insensitive)
     after_risks: List[Dict[str, Any]] = []
     details: List[Dict[str, Any]] = []
-    for r in risks:
-        key = r["name"].lower()
-        miti = mitigations.get(key, {"dp": 0.0, "dL": 0.0, "cost": 0.0})
-        p2, L2 = _apply_mitigation(r, miti)
-        after_risks.append({"name": r["name"], "p": p2, "L": L2})
-        EL_b = r["p"] * r["L"]
+    if np is not None and risks:
+        # SoA-vektorointi: sadoilla riskeillä (batch-pisteytys) rivi kerrallaan
+        # -Python-silmukka on kuuma polku — tee aritmetiikka taulukoina ja
+        # materialisoi dictit vasta Markdown-reunalla.
+        count = len(risks)
+        names = [r["name"] for r in risks]
+        mit = [mitigations.get(nm.lower(), {}) for nm in names]
+        p = np.fromiter((r["p"] for r in risks), np.float64, count)
+        L = np.fromiter((r["L"] for r in risks), np.float64, count)
+        dp = np.fromiter((m.get("dp", 0.0) for m in mit), np.float64, count)
+        dL = np.fromiter((m.get("dL", 0.0) for m in mit), np.float64, count)
+        cost = np.fromiter((m.get("cost", 0.0) for m in mit), np.float64, count)
+        p2 = np.maximum(p - dp, 0.0)
+        L2 = np.maximum(L - L * dL, 0.0)
+        EL_b = p * L
         EL_a = p2 * L2
         red = EL_b - EL_a
-        cost = miti.get("cost", 0.0)
-        roi = (red / cost) if cost > 0 else 0.0
-        net = (red - cost)
-        details.append({
-            "name": r["name"], "EL_before": EL_b, "EL_after": EL_a,
-            "reduction": red, "cost": cost, "ROI": roi, "net": net
-        })
-
-    EL_after = _expected_loss(after_risks)
+        roi = np.divide(red, cost, out=np.zeros_like(red), where=cost > 0)
+        net = red - cost
+        EL_before = float(EL_b.sum())
+        EL_after = float(EL_a.sum())
+        for i, nm in enumerate(names):
+            after_risks.append({"name": nm, "p": float(p2[i]), "L": float(L2[i])})
+            details.append({
+                "name": nm, "EL_before": float(EL_b[i]), "EL_after": float(EL_a[i]),
+                "reduction": float(red[i]), "cost": float(cost[i]),
+                "ROI": float(roi[i]), "net": float(net[i])
+            })
+    else:
+        EL_before = _expected_loss(risks)
+        for r in risks:
+            key = r["name"].lower()
+            miti = mitigations.get(key, {"dp": 0.0, "dL": 0.0, "cost": 0.0})
+            p2, L2 = _apply_mitigation(r, miti)
+            after_risks.append({"name": r["name"], "p": p2, "L": L2})
+            EL_b = r["p"] * r["L"]
+            EL_a = p2 * L2
+            red = EL_b - EL_a
+            cost = miti.get("cost", 0.0)
+            roi = (red / cost) if cost > 0 else 0.0
+            net = (red - cost)
+            details.append({
+                "name": r["name"], "EL_before": EL_b, "EL_after": EL_a,
+                "reduction": red, "cost": cost, "ROI": roi, "net": net
+            })
+        EL_after = _expected_loss(after_risks)
+
     reduction = EL_before - EL_after
 
     # 5) Simulointi (valinnainen)
     do_sim = "simulate" in user_l or (((context or {}).get("risk") or {}).get("simulate") is True)
     seed = int(((context or {}).get("risk") or {}).get("seed", 42))
     var95 = es95 = None
+    sim_red = None
+    do_strat = (((context or {}).get("risk") or {}).get("stratified") is True) and np is not None
     if do_sim:
-        var95, es95 = _simulate_losses(after_risks, trials=20000, seed=seed)
-
-    # Markdown
-    md: List[str] = []
-    md.append("# RiskExpectedLoss")
-    md.append("**Top Risks:**")
-    for r in risks:
-        md.append(f"- {r['name']}: p={r['p']:.2f}, L={r['L']:,.0f}, EL={r['p']*r['L']:,.0f}")
-    md.append("\n**Expected Loss:**")
-    md.append(f"EL_total_before = {EL_before:,.0f}")
-    md.append(f"EL_total_after  = {EL_after:,.0f}")
-    md.append(f"Risk-reduction  = {reduction:,.0f}")
-
-    md.append("\n**Mitigation:**")
-    for d in details:
-        md.append(
-            f"- {d['name']}: EL_before={d['EL_before']:,.0f} → EL_after={d['EL_after']:,.0f} "
-            f"(reduction={d['reduction']:,.0f}); cost={d['cost']:,.0f}; "
-            f"ROI={d['ROI']:.2f}; net_gain={d['net']:,.0f}"
-        )
+        if do_strat:
+            # Ositettu estimaattori kvantiileille; parivertailun Δloss jää
+            # pois, koska ositteet eivät jaa yhteisiä draw'eja ajojen välillä.
+            var95_b, es95_b = _strat_cached(_risk_key(risks), 20000, seed)
+            var95, es95 = _strat_cached(_risk_key(after_risks), 20000, seed)
+        else:
+            var95_b, es95_b, var95, es95, sim_red = _pair_cached(
+                _risk_key(risks), _risk_key(after_risks), 20000, seed
+            )
 
+    # Markdown — yksi StringIO-kirjoittaja ja sektiokohtaiset joinit, ei
+    # montaa pientä append+join-kierrosta isoilla riskimäärillä.
+    buf = io.StringIO()
+    buf.write("# RiskExpectedLoss\n**Top Risks:**\n")
+    buf.write("\n".join(
+        f"- {r['name']}: p={r['p']:.2f}, L={r['L']:,.0f}, EL={r['p']*r['L']:,.0f}"
+        for r in risks
+    ))
+    buf.write(
+        f"\n\n**Expected Loss:**\n"
+        f"EL_total_before = {EL_before:,.0f}\n"
+        f"EL_total_after  = {EL_after:,.0f}\n"
+        f"Risk-reduction  = {reduction:,.0f}\n"
+    )
+    buf.write("\n**Mitigation:**\n")
+    buf.write("\n".join(
+        f"- {d['name']}: EL_before={d['EL_before']:,.0f} → EL_after={d['EL_after']:,.0f} "
+        f"(reduction={d['reduction']:,.0f}); cost={d['cost']:,.0f}; "
+        f"ROI={d['ROI']:.2f}; net_gain={d['net']:,.0f}"
+        for d in details
+    ))
     if do_sim:
-        md.append("\n**Simulation (Monte Carlo, independent risks):**")
-        md.append(f"- VaR95 ≈ {var95:,.0f}")
-        md.append(f"- ES95  ≈ {es95:,.0f}")
-        md.append(f"- Seed  = {seed}")
-
-    md.append("\n**Uncertainty:**")
-    md.append("Assume independent risks (in simulation). Δp/ΔL/Cost estimates must be sourced; use ±20% sensitivity.")
-
-    markdown = "\n".join(md)
+        buf.write(
+            f"\n\n**Simulation (Monte Carlo, independent risks):**\n"
+            f"- VaR95 ≈ {var95:,.0f}\n"
+            f"- ES95  ≈ {es95:,.0f}\n"
+            f"- VaR95 (before mitigation) ≈ {var95_b:,.0f}\n"
+            f"- ES95  (before mitigation) ≈ {es95_b:,.0f}\n"
+            + (f"- Simulated Δloss (paired, common random numbers) ≈ {sim_red:,.0f}\n"
+               if sim_red is not None else
+               "- Sampling = stratified on dominant risk\n")
+            + f"- Seed  = {seed}"
+        )
+    buf.write(
+        "\n\n**Uncertainty:**\n"
+        "Assume independent risks (in simulation). Δp/ΔL/Cost estimates must be sourced; use ±20% sensitivity."
+    )
+    markdown = buf.getvalue()
     sections_present = ["Top Risks", "Expected Loss", "Mitigation", "Uncertainty"]
     if do_sim:
         sections_present.append("Simulation")
@@ -3,20 +3,26 @@ from __future__ import annotations
 import re
 from typing import Dict, Any, List, Tuple
 
+# --- Optional NumPy (graceful fallback) ---
+try:
+    import numpy as np
+except Exception:
+    np = None
+
 BENEFIT_KEYS = {"impact", "benefit", "value", "score"}
 COST_KEYS    = {"cost", "risk", "time", "effort", "price", "budget"}
 
-ALT_PATTERNS = [
+# Molemmat optiomuodot yhdessä alternaatiossa → yksi skannaus tekstin yli
+ALT_RE = re.compile(
     r"""
-    (?P<label>[A-Z])              # A/B/C
+    (?P<label1>[A-Z])             # A/B/C
     \s*[:(]\s*
-    (?P<body>[^)|;]+)             # impact 9, cost 7000, risk 0.25
+    (?P<body1>[^)|;]+)            # impact 9, cost 7000, risk 0.25
     [);]?
-    """,
-    r"""
-    (?<!\w)option\s*(?P<label>[A-Z])\s*[:\-]\s*(?P<body>[^;]+)
-    """,
-]
+    |
+    (?<!\w)option\s*(?P<label2>[A-Z])\s*[:\-]\s*(?P<body2>[^;]+)
+    """, re.VERBOSE | re.IGNORECASE
+)
 
 # Hyväksyy: key=9, key:9, key 9, key = 9, key : 9
 KV_PAT = re.compile(
@@ -28,13 +34,18 @@ KV_PAT = re.compile(
     re.VERBOSE | re.IGNORECASE,
 )
 
+_HAS_DIGIT_RE = re.compile(r"\d")
+_COMPARE_RE = re.compile(r"\bcompare\s+[A-Z]\s+vs\s+[A-Z]\b", re.I)
+
 def _parse_options(user_text: str) -> Dict[str, Dict[str, float]]:
     text = user_text.strip()
     options: Dict[str, Dict[str, float]] = {}
-    for pat in ALT_PATTERNS:
-        for m in re.finditer(pat, text, re.VERBOSE | re.IGNORECASE):
-            label = m.group("label").upper()
-            body = m.group("body")
+    # Numeroton teksti ei voi tuottaa yhtään optioarvoa → ohitetaan
+    # verbose-regexit kokonaan (compare-fallback tarkistetaan silti alla)
+    if _HAS_DIGIT_RE.search(text):
+        for m in ALT_RE.finditer(text):
+            label = (m.group("label1") or m.group("label2")).upper()
+            body = m.group("body1") or m.group("body2")
             kvs = {}
             for km in KV_PAT.finditer(body):
                 k = km.group("key").lower().strip()
@@ -44,7 +55,7 @@ def _parse_options(user_text: str) -> Dict[str, Dict[str, float]]:
                 options[label] = kvs
 
     # Jos mitään A/B-arvoja ei löytynyt, tarjoa klassinen fallback (A vs B → luo A,B,C)
-    if not options and re.search(r"\bcompare\s+[A-Z]\s+vs\s+[A-Z]\b", text, re.I):
+    if not options and _COMPARE_RE.search(text):
         options = {
             "A": {"impact": 8, "cost": 7000, "risk": 0.25},
             "B": {"impact": 7, "cost": 5500, "risk": 0.30},
@@ -52,29 +63,72 @@ def _parse_options(user_text: str) -> Dict[str, Dict[str, float]]:
         }
     return options
 
+# Muistetaan kertaalleen luokitellut avaimet — samat kriteerinimet toistuvat
+# kutsusta toiseen, joten substring-skannaus tehdään vain kerran per nimi.
+_POLARITY_CACHE: Dict[str, str] = {}
+
 def _decide_attribute_polarity(keys: List[str]) -> Dict[str, str]:
     pol: Dict[str, str] = {}
     for k in keys:
-        lk = k.lower()
-        if lk in BENEFIT_KEYS:
-            pol[k] = "benefit"
-        elif lk in COST_KEYS:
-            pol[k] = "cost"
-        else:
-            pol[k] = "cost" if any(x in lk for x in ("risk","cost","price","loss")) else "benefit"
+        cached = _POLARITY_CACHE.get(k)
+        if cached is None:
+            lk = k.lower()
+            if lk in BENEFIT_KEYS:
+                cached = "benefit"
+            elif lk in COST_KEYS:
+                cached = "cost"
+            else:
+                cached = "cost" if any(x in lk for x in ("risk","cost","price","loss")) else "benefit"
+            if len(_POLARITY_CACHE) < 1024:
+                _POLARITY_CACHE[k] = cached
+        pol[k] = cached
     return pol
 
-def _min_max(values: List[float]) -> Tuple[float, float]:
-    return min(values), max(values)
+def _normalize_matrix_arr(M, cost_mask):
+    # SoA-ydin: min/max, skaalaus ja cost-käännös sarakeoperaatioina (O, K)-matriisille.
+    lo = np.nanmin(M, axis=0)
+    hi = np.nanmax(M, axis=0)
+    rng_col = np.maximum(hi - lo, 1e-12)
+    S_mat = (M - lo) / rng_col
+    # Cost-sarakkeet suoraan (hi-raw)/rng — sama kaava kuin skalaaripolussa
+    # myös degeneroituneessa lo==hi-tapauksessa (1-S antaisi siinä 1.0, ei 0.0)
+    S_mat[:, cost_mask] = (hi[cost_mask] - M[:, cost_mask]) / rng_col[cost_mask]
+    np.clip(S_mat, 0.0, 1.0, out=S_mat)
+    return S_mat, lo, hi
 
 def _normalize_matrix(options: Dict[str, Dict[str, float]], polarity: Dict[str, str]) -> Tuple[Dict[str, Dict[str, float]], Dict[str, Tuple[float, float]]]:
     all_keys = sorted({k for d in options.values() for k in d.keys()})
+    if np is not None and options and all_keys:
+        # Vektoroitu polku: (O, K)-matriisi kerran, NaN puuttuville arvoille.
+        labels = list(options)
+        M = np.array([[options[o].get(k, np.nan) for k in all_keys] for o in labels], dtype=np.float64)
+        cost_mask = np.fromiter(
+            (polarity.get(k, "benefit") != "benefit" for k in all_keys),
+            dtype=bool, count=len(all_keys),
+        )
+        S_mat, lo, hi = _normalize_matrix_arr(M, cost_mask)
+        S = {
+            o: {k: float(S_mat[i, j]) for j, k in enumerate(all_keys) if not np.isnan(M[i, j])}
+            for i, o in enumerate(labels)
+        }
+        domains = {k: (float(lo[j]), float(hi[j])) for j, k in enumerate(all_keys)}
+        return S, domains
     domains: Dict[str, Tuple[float, float]] = {}
     for k in all_keys:
-        vs = [options[o][k] for o in options if k in options[o]]
-        if not vs:
+        # Yksi läpikäynti per kriteeri ilman välilistaa
+        lo = hi = None
+        for o in options:
+            v = options[o].get(k)
+            if v is None:
+                continue
+            if lo is None:
+                lo = hi = v
+            elif v < lo:
+                lo = v
+            elif v > hi:
+                hi = v
+        if lo is None:
             continue
-        lo, hi = _min_max(vs)
         domains[k] = (lo, hi)
 
     S: Dict[str, Dict[str, float]] = {o: {} for o in options}
@@ -94,9 +148,50 @@ def _normalize_matrix(options: Dict[str, Dict[str, float]], polarity: Dict[str,
             S[o][k] = max(0.0, min(1.0, s))
     return S, domains
 
+# Saatyn satunnaisindeksit CR-laskentaan (n → RI)
+_RI = {1: 0.0, 2: 0.0, 3: 0.58, 4: 0.90, 5: 1.12,
+       6: 1.24, 7: 1.32, 8: 1.41, 9: 1.45, 10: 1.49}
+
+def _weights_from_pairwise(A: List[List[float]], keys: List[str]) -> Tuple[Dict[str, float], float]:
+    """
+    AHP-painot parivertailumatriisista: geometriset keskiarvot log-avaruudessa
+    (np.log + mean + exp yhdellä passilla) ja konsistenssisuhde CR
+    lambda_max-estimaatista. Palauttaa (painot, CR).
+    """
+    n = len(keys)
+    if np is not None:
+        M = np.maximum(np.asarray(A, dtype=np.float64), 1e-12)
+        gm = np.exp(np.log(M).mean(axis=1))
+        wv = gm / gm.sum()
+        Aw = M @ wv
+        lam = float((Aw / np.maximum(wv, 1e-12)).mean())
+        w = [float(x) for x in wv]
+    else:
+        import math
+        gm = [math.exp(sum(math.log(max(x, 1e-12)) for x in row) / n) for row in A]
+        s = sum(gm)
+        w = [g / s for g in gm]
+        Aw = [sum(A[i][j] * w[j] for j in range(n)) for i in range(n)]
+        lam = sum(aw / max(wi, 1e-12) for aw, wi in zip(Aw, w)) / n
+    ci = (lam - n) / (n - 1) if n > 1 else 0.0
+    ri = _RI.get(n, 1.49)
+    cr = (ci / ri) if ri > 0 else 0.0
+    return {k: w[i] for i, k in enumerate(keys)}, cr
+
 def _weights_from_ctx(session_ctx: Dict[str, Any], keys: List[str]) -> Dict[str, float]:
     default = {"impact": 0.5, "cost": 0.3, "risk": 0.2}
     w: Dict[str, float] = {}
+    mcda_ctx = ((session_ctx or {}).get("mcda") or {}) if session_ctx else {}
+    pw = mcda_ctx.get("pairwise")
+    if isinstance(pw, list) and keys and len(pw) == len(keys):
+        # Parivertailumatriisi annettu → AHP-painot, jos matriisi on
+        # riittävän konsistentti (CR < 0.10; pienillä n CR on aina 0).
+        try:
+            ahp_w, cr = _weights_from_pairwise(pw, keys)
+        except (TypeError, ValueError):
+            ahp_w, cr = None, 1.0
+        if ahp_w is not None and cr < 0.10:
+            return ahp_w
     ctxw = ((session_ctx or {}).get("mcda") or {}).get("weights") if session_ctx else None
     for k in keys:
         lk = k.lower()
@@ -129,10 +224,33 @@ def _utility(S: Dict[str, Dict[str, float]], weights: Dict[str, float]) -> Dict[
         U[o] = sum(weights.get(k,0.0)*row.get(k,0.0) for k in row)
     return U
 
+def _stability_arr(S_mat, w, labels: List[str], keys: List[str], base_idx: int) -> Tuple[bool, str]:
+    # Kaikki K perturboitua painovektoria yhtenä (K, K) -matriisina ja
+    # hyödyt yhtenä GEMM:inä K erillisen pisteytyskierroksen sijaan.
+    K = len(keys)
+    W = np.tile(w, (K, 1))
+    diag = np.arange(K)
+    W[diag, diag] = np.minimum(1.0, W[diag, diag] + 0.10)
+    sums = W.sum(axis=1, keepdims=True)
+    valid = sums[:, 0] > 0
+    W = np.divide(W, sums, out=W, where=sums > 0)
+    U_pert = S_mat @ W.T  # (O, K)
+    winners = U_pert.argmax(axis=0)
+    notes = [
+        f"Switch if {keys[k]}+0.10 → {labels[winners[k]]}"
+        for k in range(K) if valid[k] and winners[k] != base_idx
+    ]
+    return (not notes), ("; ".join(notes) if notes else "Stable to +0.10 single-weight tweaks.")
+
 def _stability_check(U: Dict[str, float], weights: Dict[str, float], S: Dict[str, Dict[str, float]]) -> Tuple[bool, str]:
     if not U: return False, "No options."
     base_best = max(U, key=U.get)
     keys = list(weights.keys())
+    if np is not None and keys:
+        labels = list(S)
+        S_mat = np.array([[S[o].get(k, 0.0) for k in keys] for o in labels], dtype=np.float64)
+        w = np.fromiter((weights.get(k, 0.0) for k in keys), np.float64, len(keys))
+        return _stability_arr(S_mat, w, labels, keys, labels.index(base_best))
     changed = False
     notes = []
     for k in keys:
@@ -165,11 +283,35 @@ def run(user_text: str, context: Dict[str, Any]) -> Dict[str, Any]:
 
     all_keys = sorted({k for d in options.values() for k in d.keys()})
     polarity = _decide_attribute_polarity(all_keys)
-    S, domains = _normalize_matrix(options, polarity)
     weights = _weights_from_ctx(session_ctx, all_keys)
-    U = _utility(S, weights)
-    rec = max(U, key=U.get) if U else None
-    stable, note = _stability_check(U, weights, S)
+    if np is not None and options and all_keys:
+        # SoA-polku: (O, K)-matriisi rakennetaan kerran ja normalisointi,
+        # hyödyt ja herkkyystarkastelu ovat sarakeoperaatioita samalle
+        # matriisille — dicteihin palataan vasta markdown-rajapinnassa.
+        labels = list(options)
+        M = np.array([[options[o].get(k, np.nan) for k in all_keys] for o in labels], dtype=np.float64)
+        cost_mask = np.fromiter(
+            (polarity.get(k, "benefit") != "benefit" for k in all_keys),
+            dtype=bool, count=len(all_keys),
+        )
+        S_mat, _lo, _hi = _normalize_matrix_arr(M, cost_mask)
+        present = ~np.isnan(M)
+        S_fill = np.where(present, S_mat, 0.0)
+        w = np.fromiter((weights.get(k, 0.0) for k in all_keys), np.float64, len(all_keys))
+        U_vec = S_fill @ w
+        base_idx = int(U_vec.argmax())
+        rec = labels[base_idx]
+        stable, note = _stability_arr(S_fill, w, labels, all_keys, base_idx)
+        S = {
+            o: {k: float(S_mat[i, j]) for j, k in enumerate(all_keys) if present[i, j]}
+            for i, o in enumerate(labels)
+        }
+        U = {o: float(U_vec[i]) for i, o in enumerate(labels)}
+    else:
+        S, domains = _normalize_matrix(options, polarity)
+        U = _utility(S, weights)
+        rec = max(U, key=U.get) if U else None
+        stable, note = _stability_check(U, weights, S)
 
     md: List[str] = []
     md.append("# StrategyMCDA")
@@ -14,45 +14,50 @@ def _intent(context: Dict[str, Any]) -> str:
         return sess["intent"]
     return "general"
 
+# Kehykset ovat Thesis-riviä lukuun ottamatta täysin staattisia — joinataan
+# kerran moduulin latauksessa, ei per pyyntö.
+_SCIENTIFIC_MD = "\n".join([
+    "# Structure",
+    "**Hypothesis:**",
+    "- Formulate a precise, testable statement tied to the question at hand.",
+    "\n**Predictions:**",
+    "- What observable patterns should occur if the hypothesis is true?",
+    "- Define expected direction/magnitude and confidence threshold.",
+    "\n**Variables:**",
+    "- X (independent), Y (dependent), Z (controls).",
+    "- Measurement scales and operational definitions.",
+    "\n**Method:**",
+    "- Design (experiment / quasi / observational), sampling, power.",
+    "- Analysis plan (model, metrics, alpha, corrections).",
+    "\n**Data Needs:**",
+    "- Sources, collection window, quality checks, preregistration pointers.",
+    "\n**Next Step:**",
+    "Collect minimal dataset, run pilot analysis, refine hypothesis or stop.",
+])
+
+_GENERAL_HEAD = "# Structure\n**Thesis:**\n"
+_GENERAL_TAIL = "\n" + "\n".join([
+    "\n**Key Points:**",
+    "- Clarify long-term goal (2–3 years).",
+    "- List constraints and resources (time, money, skills).",
+    "- Define decision timeline and success criteria.",
+    "\n**Counterpoints:**",
+    "- What if priorities change mid-course?",
+    "- What if constraints tighten (budget/time)?",
+    "\n**Actions:**",
+    "- Write 1–3 concrete outcomes.",
+    "- Pick a planning horizon (e.g., 24–36 months).",
+    "- List top 3 constraints and 3 resources.",
+    "\n**Next Step:**",
+    "Answer: goal, constraints, timeframe.",
+])
+
 def _scientific_frame(user_text: str) -> str:
-    lines: List[str] = []
-    lines.append("# Structure")
-    lines.append("**Hypothesis:**")
-    lines.append("- Formulate a precise, testable statement tied to the question at hand.")
-    lines.append("\n**Predictions:**")
-    lines.append("- What observable patterns should occur if the hypothesis is true?")
-    lines.append("- Define expected direction/magnitude and confidence threshold.")
-    lines.append("\n**Variables:**")
-    lines.append("- X (independent), Y (dependent), Z (controls).")
-    lines.append("- Measurement scales and operational definitions.")
-    lines.append("\n**Method:**")
-    lines.append("- Design (experiment / quasi / observational), sampling, power.")
-    lines.append("- Analysis plan (model, metrics, alpha, corrections).")
-    lines.append("\n**Data Needs:**")
-    lines.append("- Sources, collection window, quality checks, preregistration pointers.")
-    lines.append("\n**Next Step:**")
-    lines.append("Collect minimal dataset, run pilot analysis, refine hypothesis or stop.")
-    return "\n".join(lines)
+    return _SCIENTIFIC_MD
 
 def _general_frame(user_text: str) -> str:
-    lines: List[str] = []
-    lines.append("# Structure")
-    lines.append("**Thesis:**")
-    lines.append(f"{user_text.strip() or 'You are exploring a strategic overview.'}")
-    lines.append("\n**Key Points:**")
-    lines.append("- Clarify long-term goal (2–3 years).")
-    lines.append("- List constraints and resources (time, money, skills).")
-    lines.append("- Define decision timeline and success criteria.")
-    lines.append("\n**Counterpoints:**")
-    lines.append("- What if priorities change mid-course?")
-    lines.append("- What if constraints tighten (budget/time)?")
-    lines.append("\n**Actions:**")
-    lines.append("- Write 1–3 concrete outcomes.")
-    lines.append("- Pick a planning horizon (e.g., 24–36 months).")
-    lines.append("- List top 3 constraints and 3 resources.")
-    lines.append("\n**Next Step:**")
-    lines.append("Answer: goal, constraints, timeframe.")
-    return "\n".join(lines)
+    # Vain Thesis-rivi riippuu syötteestä — kaksi vakio-osaa sen ympärillä.
+    return _GENERAL_HEAD + (user_text.strip() or "You are exploring a strategic overview.") + _GENERAL_TAIL
 
 def run(user_text: str, context: Dict[str, Any]) -> Dict[str, Any]:
     intent = _intent(context).lower()
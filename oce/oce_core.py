@@ -1,7 +1,15 @@
 # oce/oce_core.py
 from __future__ import annotations
 from typing import Dict, List, Callable, Optional, Tuple, Any
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+import asyncio
+import copy
+import functools
 import importlib
+import os
+import threading
+import time
 import traceback
 import re
 
@@ -38,6 +46,39 @@ MythGuard      = _safe_import("oce.meta.myth_guard", "MythGuard")
 BiasSentinel   = _safe_import("oce.meta.bias_sentinel", "BiasSentinel")
 SafetyGate     = _safe_import("oce.meta.safety_gate", "SafetyGate")
 
+# META-instanssit kerran moduulin latauksessa ja metodit valmiiksi sidottuina
+# — ei seitsemää konstruktorikutsua per pyyntö. Jos konstruktori kaatuu,
+# callable jää Noneksi ja pyyntöpolku käyttää samaa na-fallbackia kuin ennen.
+def _bind_meta(cls, method: str) -> Optional[Callable]:
+    if cls is None:
+        return None
+    try:
+        return getattr(cls(), method, None)
+    except Exception:
+        return None
+
+# Jaettu pooli META-analyysien fan-outiin; säikeet ovat daemoneita eivätkä
+# estä prosessin sulkeutumista.
+_META_POOL = ThreadPoolExecutor(max_workers=6, thread_name_prefix="oce-meta")
+
+# Moduuliajot ovat toisistaan riippumattomia ja jakavat vain luku-käytössä
+# olevan module_contextin → ajetaan rinnan, tulokset kerätään valintajärjestyksessä.
+_MODULE_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="oce-mod")
+
+# Muisti-I/O:lle oma kapea pooli, ettei hidas store syö moduulisäikeitä.
+_IO_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="oce-io")
+
+# Budjetti muistiyhteenvedon odotukselle; ylittyessä jatketaan tyhjällä.
+_MEMORY_TIMEOUT = 0.5  # sekuntia
+
+_cfl_assess     = _bind_meta(CFLEthics, "assess")
+_evidence_check = _bind_meta(EvidenceEngine, "check")
+_gps_score      = _bind_meta(GPSPrioritizer, "score")
+_metacog_assess = _bind_meta(MetacogCalib, "assess")
+_myth_analyze   = _bind_meta(MythGuard, "analyze")
+_bias_assess    = _bind_meta(BiasSentinel, "assess")
+_policy_decide  = _bind_meta(SafetyGate, "decide")
+
 # Pro-selitekortti (valinnainen)
 ExplainCardRender = None
 for cand in ("render_card", "render", "pro_explain"):
@@ -57,15 +98,42 @@ def _try_get_runner(modpath: str) -> Optional[Callable]:
             return getattr(m, fn)
     return None
 
+# Debug-lippu luetaan kerran latauksessa; OCE_DEBUG=1 palauttaa täydet tracet.
+_DEBUG = os.environ.get("OCE_DEBUG") == "1"
+
+# Internoidut vakiostatukset — ei uutta dict-allokaatiota per META-kenttä per
+# pyyntö. Tavallisia dictejä MappingProxyn sijaan, koska vastaukset kulkevat
+# deepcopyn ja JSON-serialisoinnin läpi, jotka eivät tue mappingproxyä;
+# kukaan ei mutatoi näitä.
+_STATUS_NA      = {"status": "na"}
+_STATUS_ALLOW   = {"status": "allow"}
+_STATUS_SKIPPED = {"status": "skipped"}
+
+# module_contextin runko; per pyyntö otetaan matala kopio ja täytetään arvot.
+_CTX_TEMPLATE: Dict[str, Any] = {
+    "session_ctx": None,
+    "intent": None,
+    "heuristics": None,
+    "memory": None,
+}
+
+# Steroidit: lisätty CFL-runner mapping
+_MAPPING = {
+    "Structure":        "oce.modules.structure",
+    "StrategyMCDA":     "oce.modules.strategy_mcda",
+    "RiskExpectedLoss": "oce.modules.risk_expected_loss",
+    "CFL":              "oce.modules.cfl",
+}
+
+@functools.lru_cache(maxsize=None)
+def _resolve_runner(modname: str) -> Optional[Callable]:
+    # Import + run/generate/execute/main-probaus kerran per prosessi —
+    # sama moduuli valitaan pyyntö toisensa jälkeen.
+    modpath = _MAPPING.get(modname)
+    return _try_get_runner(modpath) if modpath else None
+
 def _run_module_safely(modname: str, user_text: str, context: dict) -> Tuple[str, List[str], List[str]]:
-    # Steroidit: lisätty CFL-runner mapping
-    mapping = {
-        "Structure":        "oce.modules.structure",
-        "StrategyMCDA":     "oce.modules.strategy_mcda",
-        "RiskExpectedLoss": "oce.modules.risk_expected_loss",
-        "CFL":              "oce.modules.cfl",
-    }
-    runner = _try_get_runner(mapping.get(modname, "")) if modname in mapping else None
+    runner = _resolve_runner(modname)
     if runner is None:
         stub_md = f"# {modname}\n_Module runner not found; produced a minimal placeholder._\n"
         return stub_md, [], []
@@ -78,26 +146,41 @@ def _run_module_safely(modname: str, user_text: str, context: dict) -> Tuple[str
             md = f"# {modname}\n_(no output)_\n"
         return md, sp, sm
     except Exception as e:
-        log_exception("module_run_error", {"module": modname, "error": str(e), "trace": traceback.format_exc()})
+        # Koko stackin formatointi on kallista suhteessa onnistuneeseen
+        # ajoon — täysi trace vain debug-tilassa, tuotannossa repr riittää.
+        if _DEBUG:
+            log_exception("module_run_error", {"module": modname, "error": str(e), "trace": traceback.format_exc()})
+        else:
+            log_exception("module_run_error", {"module": modname, "error": repr(e)})
         err_md = f"# {modname}\n_Error while running module: {e}_\n"
         return err_md, [], []
 
 # -------- Heuristic path formatting --------
 def _format_heuristic_path(rr: router.RouteResult) -> str:
-    hits = rr.keyword_hits.get(rr.intent, [])
+    # Attribuuttihaut kerran lokaaleihin; tyhjille listoille ei turhaa joinia.
+    intent = rr.intent
+    hits = rr.keyword_hits.get(intent) or ()
     hits_s = ",".join(hits) if hits else "-"
-    mods_s = ", ".join(rr.selected_modules) if rr.selected_modules else "-"
-    return f"intent={rr.intent} ({rr.confidence}) | keywords=[{hits_s}] | modules=[{mods_s}] | self_check={rr.self_check}"
+    mods = rr.selected_modules
+    mods_s = ", ".join(mods) if mods else "-"
+    return f"intent={intent} ({rr.confidence}) | keywords=[{hits_s}] | modules=[{mods_s}] | self_check={rr.self_check}"
+
+# Timely-vihje: käännetty kerran, IGNORECASE korvaa per-pyyntö-lowerin.
+_TIMELY_RE = re.compile(r"\b(?:today|latest|breaking|20(?:2[4-9]|3\d))\b", re.IGNORECASE)
 
 # -------- Lightweight extractors for memory --------
 _BULLET = re.compile(r"^\s*[-•]\s+(.*)$", re.MULTILINE)
 
+_ACTION_HEADERS = ("**Actions:**", "**Next Step:**", "**Next Steps:**")
+
 def _extract_actions(md: str) -> List[str]:
-    # Hakee kohdan "**Actions:**" tai "**Next Step:**" jälkeiset bulletit
+    # Hakee kohdan "**Actions:**" tai "**Next Step:**" jälkeiset bulletit.
+    # find + viipale: yksi skannaus per otsikko eikä splitin välilistaa.
     chunks: List[str] = []
-    for header in ("**Actions:**", "**Next Step:**", "**Next Steps:**"):
-        if header in md:
-            part = md.split(header, 1)[1]
+    for header in _ACTION_HEADERS:
+        idx = md.find(header)
+        if idx >= 0:
+            part = md[idx + len(header):]
             hits = _BULLET.findall(part)[:6]
             if hits:
                 chunks.extend(hits)
@@ -112,8 +195,47 @@ def _extract_topics(md: str) -> List[str]:
                 return [th.strip()[:120]]
     return []
 
+# Vastauskätkö: identtiset (user_text, session_ctx) -parit toistuvat
+# testeissä ja chat-tyylisissä uusinnoissa — osuma palauttaa deepcopyn
+# mikrosekunneissa. TTL pitää kätkön tuoreena; ei-hashattava konteksti
+# tai no_cache=True ohittaa kätkön kokonaan.
+_RESP_CACHE: "OrderedDict[Tuple, Tuple[float, dict]]" = OrderedDict()
+_RESP_CACHE_MAX = 256
+_RESP_CACHE_TTL = 60.0  # sekuntia
+_RESP_CACHE_LOCK = threading.Lock()
+
+def _cache_key(user_text: str, session_ctx: dict):
+    if session_ctx.get("no_cache"):
+        return None
+    try:
+        key = (user_text, tuple(sorted(session_ctx.items())))
+        hash(key)
+        return key
+    except TypeError:
+        return None
+
 # -------- Public API --------
 def run_oce(user_text: str, session_ctx: dict) -> dict:
+    key = _cache_key(user_text, session_ctx)
+    if key is not None:
+        now = time.monotonic()
+        with _RESP_CACHE_LOCK:
+            entry = _RESP_CACHE.get(key)
+            if entry is not None and now - entry[0] < _RESP_CACHE_TTL:
+                _RESP_CACHE.move_to_end(key)
+                log_event("OCE_CACHE", {"hit": True})
+                return copy.deepcopy(entry[1])
+        log_event("OCE_CACHE", {"hit": False})
+    result = _run_oce_impl(user_text, session_ctx)
+    if key is not None:
+        with _RESP_CACHE_LOCK:
+            _RESP_CACHE[key] = (time.monotonic(), copy.deepcopy(result))
+            _RESP_CACHE.move_to_end(key)
+            while len(_RESP_CACHE) > _RESP_CACHE_MAX:
+                _RESP_CACHE.popitem(last=False)
+    return result
+
+def _run_oce_impl(user_text: str, session_ctx: dict) -> dict:
     """
     Orchestrates the OCE pipeline:
       1) heuristic routing (+timely hint)
@@ -127,52 +249,96 @@ def run_oce(user_text: str, session_ctx: dict) -> dict:
     log_event("OCE_START", {"project_id": project_id})
 
     # 0) Timely-lippu (auttaa EvidenceEngineä)
-    if re.search(r"\b(today|latest|breaking|20(2[4-9]|3[0-9]))\b", user_text.lower()):
+    if _TIMELY_RE.search(user_text):
         session_ctx["timely"] = True
 
-    # 0b) Lataa lyhyt muistiyhteenveto (MVP)
-    short_mem = {"topics": [], "decisions": [], "next_steps": []}
-    if load_summary:
-        try:
-            short_mem = load_summary(project_id) or short_mem
-        except Exception:
-            pass
+    # 0b) Muistiyhteenvedon haku käynnistetään heti taustalle, jolloin
+    # store-I/O limittyy reitityksen kanssa; tulos luetaan vasta kun
+    # module_context rakennetaan.
+    mem_future = _IO_POOL.submit(load_summary, project_id) if load_summary else None
 
     # 1) HEURISTICS
     rr = router.evaluate(user_text)
     log_heuristic(rr)
     selected = rr.selected_modules[:]
 
+    short_mem = {"topics": [], "decisions": [], "next_steps": []}
+    if mem_future is not None:
+        try:
+            short_mem = mem_future.result(timeout=_MEMORY_TIMEOUT) or short_mem
+        except FuturesTimeout:
+            # Budjetti ylittyi → jatketaan tyhjällä yhteenvedolla
+            log_event("memory_budget_exceeded", {"project_id": project_id})
+        except Exception:
+            pass
+
     # Steroidit: varmista, että intent näkyy myös session_ctx:ssä
     session_ctx["intent"] = rr.intent
 
+    # 1b) Policy ensin: SafetyGate tarvitsee vain session_ctx:n, joten evätty
+    # pyyntö ei maksa moduuliajoja, METAa eikä muistikirjoitusta.
+    try:
+        policy = _policy_decide(session_ctx) if _policy_decide else _STATUS_ALLOW
+    except Exception as e:
+        policy = {"status": "error", "message": str(e)}
+    if policy.get("status") == "deny":
+        final_text = "\n".join([
+            "# OCE-CORE SUMMARY OUTPUT",
+            "ACTIVE MODULES: -",
+            f"CORE TASK: ['{rr.intent}']",
+            f"HEURISTIC PATH: {_format_heuristic_path(rr)}\n",
+            "",
+            "## META",
+            f"- Policy: {policy}",
+        ])
+        json_summary = {
+            "triggers_hit": rr.triggers_hit,
+            "applied_modules": [],
+            "sections_present": [],
+            "missing_sections": [],
+            "confidence": rr.confidence,
+            "intent": rr.intent,
+            "policy_decision": policy,
+            "memory": {"updated": False, "loaded": False},
+        }
+        log_event("OCE_END", {"modules": [], "policy": policy})
+        return {"text": final_text, "json_summary": json_summary,
+                "telemetry": {"events": ["start", "router", "policy_denied", "done"]}}
+
     # 2) RUN MODULES
     module_blocks: List[str] = []
-    sections_present: List[str] = []
-    sections_missing: List[str] = []
-
-    # Steroidit: lähetä intent myös top-levelissä module_contextiin
-    module_context: Dict[str, Any] = {
-        "session_ctx": session_ctx,
-        "intent": rr.intent,  # <-- tärkeä Structure/CFL tuki
-        "heuristics": {
-            "intent": rr.intent,
-            "confidence": rr.confidence,
-            "keyword_hits": rr.keyword_hits,
-            "policy_max_modules": rr.policy_max_modules,
-            "self_check": rr.self_check,
-        },
-        "memory": short_mem,
+    # Set-akkumulaattorit: dedup ilmaiseksi, listaksi vasta json_summaryssa.
+    sections_present: set = set()
+    sections_missing: set = set()
+
+    # Steroidit: lähetä intent myös top-levelissä module_contextiin.
+    # Pohja kopioidaan valmiista templatesta — avainten hashays ja dictin
+    # kasvatus tehdään kerran moduulin latauksessa, ei per pyyntö.
+    module_context = _CTX_TEMPLATE.copy()
+    module_context["session_ctx"] = session_ctx
+    module_context["intent"] = rr.intent  # <-- tärkeä Structure/CFL tuki
+    module_context["heuristics"] = {
+        "intent": rr.intent,
+        "confidence": rr.confidence,
+        "keyword_hits": rr.keyword_hits,
+        "policy_max_modules": rr.policy_max_modules,
+        "self_check": rr.self_check,
     }
+    module_context["memory"] = short_mem
     for k in ("mcda", "risk"):
         if k in session_ctx:
             module_context[k] = session_ctx[k]
 
-    for m in selected:
-        md, sp, sm = _run_module_safely(m, user_text, module_context)
+    if len(selected) > 1:
+        futures = [_MODULE_POOL.submit(_run_module_safely, m, user_text, module_context)
+                   for m in selected]
+        results = [f.result() for f in futures]
+    else:
+        results = [_run_module_safely(m, user_text, module_context) for m in selected]
+    for md, sp, sm in results:
         module_blocks.append(md)
-        sections_present.extend(sp or [])
-        sections_missing.extend(sm or [])
+        sections_present.update(sp or ())
+        sections_missing.update(sm or ())
 
     # 3) VALIDATION (best-effort)
     validation_notes: List[str] = []
@@ -181,53 +347,58 @@ def run_oce(user_text: str, session_ctx: dict) -> dict:
             missing = check_sections(selected, sections_present) or []
             if missing:
                 validation_notes.append(f"Auto-check: missing sections: {missing}")
-                sections_missing.extend(missing)
+                sections_missing.update(missing)
         except Exception as e:
             validation_notes.append(f"Section check error: {e}")
 
-    # 4) META
+    # 4) META — kuusi riippumatonta analyysiä fan-outataan poolille; vain
+    # GPS odottaa cfl- ja evidence-tuloksia (DAG:in ainoa riippuvuus).
     meta_summary: Dict[str, Any] = {}
-    try:
-        cfl = CFLEthics().assess("\n\n".join(module_blocks), session_ctx) if CFLEthics else {"status":"na"}
-    except Exception as e:
-        cfl = {"status":"error", "message": str(e)}
-    meta_summary["cfl"] = cfl
-
-    try:
-        evidence = EvidenceEngine().check(session_ctx) if EvidenceEngine else {"status":"na"}
-    except Exception as e:
-        evidence = {"status":"error", "message": str(e)}
-    meta_summary["evidence"] = evidence
-
-    try:
-        gps = GPSPrioritizer().score({"cfl": cfl, "evidence": evidence}) if GPSPrioritizer else {"status":"na"}
-    except Exception as e:
-        gps = {"status":"error", "message": str(e)}
-    meta_summary["priority"] = gps
+    assembled = "\n\n".join(module_blocks)
+
+    if not module_blocks:
+        # Ei analysoitavaa (esim. reitittämätön syöte) → META-vaihe olisi
+        # puhdasta yleiskulua. Vain SafetyGate ajetaan, koska policy pätee
+        # myös tyhjään tulosteeseen.
+        for k in ("cfl", "evidence", "priority", "metacog", "mythguard", "bias"):
+            meta_summary[k] = _STATUS_SKIPPED
+        meta_summary["policy_decision"] = policy
+    else:
+        # Taulukkovetoinen fan-out: (nimi, sidottu callable, argumentit, oletus)
+        # — yksi submit-silmukka ja yksi try/except-keruupolku seitsemän
+        # käsinkirjoitetun lohkon sijaan.
+        meta_specs = (
+            ("cfl",             _cfl_assess,     (assembled, session_ctx),  _STATUS_NA),
+            ("evidence",        _evidence_check, (session_ctx,),            _STATUS_NA),
+            ("metacog",         _metacog_assess, (session_ctx,),            _STATUS_NA),
+            ("mythguard",       _myth_analyze,   (assembled, session_ctx),  _STATUS_NA),
+            ("bias",            _bias_assess,    ({"recursions": session_ctx.get("recursions", 0)},), _STATUS_NA),
+        )
+        futs = {name: _META_POOL.submit(fn, *args) for name, fn, args, _d in meta_specs if fn}
+        defaults = {name: d for name, _fn, _args, d in meta_specs}
+
+        def _safe_result(name: str) -> Dict[str, Any]:
+            fut = futs.get(name)
+            if fut is None:
+                return defaults[name]
+            try:
+                return fut.result()
+            except Exception as e:
+                return {"status": "error", "message": f"{type(e).__name__}: {e}"}
+
+        cfl = meta_summary["cfl"] = _safe_result("cfl")
+        evidence = meta_summary["evidence"] = _safe_result("evidence")
 
-    try:
-        metacog = MetacogCalib().assess(session_ctx) if MetacogCalib else {"status":"na"}
-    except Exception as e:
-        metacog = {"status":"error", "message": str(e)}
-    meta_summary["metacog"] = metacog
-
-    try:
-        myth = MythGuard().analyze("\n\n".join(module_blocks), session_ctx) if MythGuard else {"status":"na"}
-    except Exception as e:
-        myth = {"status":"error", "message": str(e)}
-    meta_summary["mythguard"] = myth
-
-    try:
-        bias = BiasSentinel().assess({"recursions": session_ctx.get("recursions", 0)}) if BiasSentinel else {"status":"na"}
-    except Exception as e:
-        bias = {"status":"error", "message": str(e)}
-    meta_summary["bias"] = bias
+        try:
+            gps = _gps_score({"cfl": cfl, "evidence": evidence}) if _gps_score else _STATUS_NA
+        except Exception as e:
+            gps = {"status":"error", "message": f"{type(e).__name__}: {e}"}
+        meta_summary["priority"] = gps
 
-    try:
-        policy = SafetyGate().decide(session_ctx) if SafetyGate else {"status":"allow"}
-    except Exception as e:
-        policy = {"status":"error", "message": str(e)}
-    meta_summary["policy_decision"] = policy
+        for name, _fn, _args, _d in meta_specs[2:]:
+            meta_summary[name] = _safe_result(name)
+        # SafetyGate ajettiin jo vaiheessa 1b — sama päätös raportoidaan tässä.
+        meta_summary["policy_decision"] = policy
 
     # 4b) PRO selitekortti
     pro_card_md = ""
@@ -241,12 +412,14 @@ def run_oce(user_text: str, session_ctx: dict) -> dict:
     did_mem_update = False
     if memory_update:
         try:
-            md_all = "\n\n".join(module_blocks)
-            topics = _extract_topics(md_all) or [rr.intent]
-            next_steps = _extract_actions(md_all)
+            topics = _extract_topics(assembled) or [rr.intent]
+            next_steps = _extract_actions(assembled)
             decisions: List[str] = []
             if topics or next_steps:
-                memory_update(project_id, topics, decisions, next_steps)
+                # Fire-and-forget: kirjoitus ei ole vastauksen kriittisellä
+                # polulla. Consolidatorin puskuri + atexit-flush huolehtii
+                # siitä, että kesken olevat kirjoitukset päätyvät levylle.
+                _IO_POOL.submit(memory_update, project_id, topics, decisions, next_steps)
                 did_mem_update = True
         except Exception:
             pass
@@ -273,13 +446,20 @@ def run_oce(user_text: str, session_ctx: dict) -> dict:
     if did_mem_update:
         meta_lines.append("- Memory: updated")
 
-    final_text = "\n".join(header_parts + module_blocks + [""] + meta_lines) + pro_card_md
+    # Kootaan yksi osalista paikallaan — ei kahta väliaikaista listaa
+    # list+list-konkatenaatioista ennen joinia.
+    header_parts.extend(module_blocks)
+    header_parts.append("")
+    header_parts.extend(meta_lines)
+    final_text = "\n".join(header_parts)
+    if pro_card_md:
+        final_text += pro_card_md
 
     json_summary = {
         "triggers_hit": rr.triggers_hit,
         "applied_modules": selected,
-        "sections_present": sections_present,
-        "missing_sections": sections_missing,
+        "sections_present": sorted(sections_present),
+        "missing_sections": sorted(sections_missing),
         "confidence": rr.confidence,
         "intent": rr.intent,
         "intents_ranked": rr.intents_ranked[:5],
@@ -307,3 +487,12 @@ def run_oce(user_text: str, session_ctx: dict) -> dict:
     telemetry = {"events": ["start", "router", "modules_run", "meta", "validated"] + (["memory_update"] if did_mem_update else []) + ["done"]}
     log_event("OCE_END", {"modules": selected, "policy": meta_summary.get("policy_decision", "allow")})
     return {"text": final_text, "json_summary": json_summary, "telemetry": telemetry}
+
+async def run_oce_async(user_text: str, session_ctx: dict) -> dict:
+    """
+    Async-kääre HTTP-palvelimelle: koko pipeline ajetaan työsäikeessä,
+    jolloin event loop ei blokkaa pyynnön ajaksi. Riippumattomat META-
+    analyysit rinnakkaistuvat jo sisäisesti _META_POOLin kautta, joten
+    erillistä asyncio.gather-hajautusta ei tarvita tässä kerroksessa.
+    """
+    return await asyncio.to_thread(run_oce, user_text, session_ctx)
@@ -3,10 +3,18 @@
 from __future__ import annotations
 from dataclasses import dataclass
 from typing import Dict, List, Tuple
+import functools
 import re
 import yaml
 from pathlib import Path
 
+# C-kiihdytetty parseri jos libyaml on asennettu; muuten sama SafeLoader,
+# jota yaml.safe_load käyttäisi.
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
 _HEUR_PATH = Path(__file__).parent / "heuristics.yaml"
 
 @dataclass
@@ -20,17 +28,43 @@ class RouteResult:
     self_check: str  # "ok" or message
     policy_max_modules: int
 
-def _load_heuristics() -> dict:
-    with open(_HEUR_PATH, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+@functools.lru_cache(maxsize=4)
+def _load_heuristics_cached(path: str, mtime: float) -> Tuple[dict, Dict[str, frozenset]]:
+    # YAML parsitaan kerran per tiedostoversio — mtime avaimessa huolehtii
+    # siitä, että muokattu heuristics.yaml luetaan uudelleen. Avainsanat
+    # pienennetään ja pakataan frozenseteiksi samassa yhteydessä.
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = yaml.load(f, Loader=_YamlLoader)
+    kw_sets = {
+        intent: frozenset(k.lower() for k in (spec.get("keywords") or []))
+        for intent, spec in (cfg.get("intents") or {}).items()
+    }
+    return cfg, kw_sets
+
+def _load_heuristics() -> Tuple[dict, Dict[str, frozenset]]:
+    try:
+        mtime = _HEUR_PATH.stat().st_mtime
+    except OSError:
+        mtime = -1.0
+    return _load_heuristics_cached(str(_HEUR_PATH), mtime)
+
+_TOKEN_RE = re.compile(r"[a-zA-ZåäöÅÄÖ0-9\-]+")
 
 def _tokenize(text: str) -> List[str]:
     # kevyt tokenisaatio ja pienennys
-    return re.findall(r"[a-zA-ZåäöÅÄÖ0-9\-]+", text.lower())
+    return _TOKEN_RE.findall(text.lower())
+
+@functools.lru_cache(maxsize=128)
+def _tokens_for(text: str) -> Tuple[frozenset, int]:
+    # Token-setti + määrä kätkössä: toistuva syöte (retryt, testit) ohittaa
+    # sekä regexin että set-rakentamisen. Määrä tarvitaan pistemallin
+    # pituusbonukseen, joten se talletetaan setin rinnalla.
+    toks = _TOKEN_RE.findall(text.lower())
+    return frozenset(toks), len(toks)
 
 def evaluate(user_text: str) -> RouteResult:
-    cfg = _load_heuristics()
-    tokens = _tokenize(user_text)
+    cfg, kw_sets = _load_heuristics()
+    tok_set, n_tokens = _tokens_for(user_text)
 
     intents_cfg: Dict[str, dict] = cfg.get("intents", {})
     policies = cfg.get("policies", {})
@@ -40,12 +74,13 @@ def evaluate(user_text: str) -> RouteResult:
     # 1) pisteytä intentit: osumat / avainsanojen määrä
     intent_scores: Dict[str, float] = {}
     keyword_hits: Dict[str, List[str]] = {}
-    for intent, spec in intents_cfg.items():
-        kws: List[str] = [k.lower() for k in spec.get("keywords", [])]
-        hits = [k for k in kws if k in tokens]
+    for intent in intents_cfg:
+        # Yksi hashattu leikkaus per intent O(kws·tokens)-skannauksen sijaan;
+        # sorted pitää osumalistan deterministisenä.
+        hits = sorted(kw_sets.get(intent, frozenset()) & tok_set)
         keyword_hits[intent] = hits
         # yksinkertainen pistemalli: osumia + pehmeä bonus pidemmille kyselyille
-        score = len(hits) + 0.05 * max(0, len(tokens) - 12)
+        score = len(hits) + 0.05 * max(0, n_tokens - 12)
         intent_scores[intent] = score
 
     ranked = sorted(intent_scores.items(), key=lambda x: x[1], reverse=True)
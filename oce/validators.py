@@ -22,7 +22,8 @@ def check_sections(selected_modules: List[str], sections_present: List[str]) ->
         "RiskExpectedLoss": {"Top Risks", "Expected Loss", "Mitigation"},
     }
     missing: List[str] = []
-    present = set(sections_present or [])
+    # Hyväksyy myös valmiin setin — ei turhaa O(n)-kopiota kuumalla polulla
+    present = sections_present if isinstance(sections_present, (set, frozenset)) else set(sections_present or [])
     for m in selected_modules or []:
         req = required_by_module.get(m, set())
         for sec in req:
@@ -1,7 +1,21 @@
 from oce.oce_core import run_oce
+from oce.memory import consolidator
 
 def test_end_to_end():
     out = run_oce("Tarvitsen strategiaa ja riskiarvion.", {"project_id":"TEST"})
     js = out["json_summary"]
     assert js["applied_modules"], "No modules applied"
     assert "policy_decision" in js
+
+def test_memory_legacy_store_upgrade(tmp_path, monkeypatch):
+    # Ennen indeksiä kirjoitettu store: vanhat rivit eivät saa kadota,
+    # kun ensimmäinen update() luo sivutiedoston.
+    store = tmp_path / "memory_store.jsonl"
+    store.write_text('{"project_id": "OLD", "topics": ["legacy"], "decisions": [], "next_steps": []}\n')
+    monkeypatch.setattr(consolidator, "STORE_PATH", str(store))
+    monkeypatch.setattr(consolidator, "IDX_PATH", str(store) + ".idx")
+    assert consolidator.load_summary("OLD")["topics"] == ["legacy"]
+    consolidator.update("NEW", ["fresh"], [], [])
+    consolidator.flush()
+    assert consolidator.load_summary("OLD")["topics"] == ["legacy"]
+    assert consolidator.load_summary("NEW")["topics"] == ["fresh"]